@@ -0,0 +1,144 @@
+"""Micro-batching of concurrent transaction-summary requests.
+
+Requests that queue up together are concatenated into a single DataFrame so
+the merchant classifier runs once per batch instead of once per request. Each
+request still gets its own aggregated summary back. A request that arrives to
+an empty queue is dispatched at once, and several batches may run at a time.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Callable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+try:
+    from backend.ml_pipeline import aggregate_by_category, categorize_transactions
+except ModuleNotFoundError:
+    from ml_pipeline import aggregate_by_category, categorize_transactions
+
+MAX_BATCH = 64
+MAX_WAIT_MS = 10
+# Batches in flight at once. Prediction mostly holds the GIL, so more than one
+# per core only interleaves; the cap also leaves pool threads for other work.
+MAX_CONCURRENT_BATCHES = os.cpu_count() or 1
+
+_REQ_ID_COL = "_req_id"
+
+
+class SummaryBatcher:
+    """Coalesce concurrent ``summarize_transactions`` calls into one prediction."""
+
+    def __init__(
+        self,
+        get_model: Callable[[], object],
+        max_batch: int = MAX_BATCH,
+        max_wait_ms: float = MAX_WAIT_MS,
+        max_concurrent: int = MAX_CONCURRENT_BATCHES,
+    ):
+        # Called from the worker thread for each batch so the model may load lazily
+        self._get_model = get_model
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._inflight: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Let batches already handed to worker threads deliver their results
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def submit(self, df: pd.DataFrame) -> dict:
+        """Queue ``df`` for the next batch and wait for its summary."""
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((df, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first so requests keep queueing (and batch
+            # up) while every slot is busy.
+            await self._slots.acquire()
+            batch: List[Tuple[pd.DataFrame, asyncio.Future]] = []
+            try:
+                batch.append(await self._queue.get())
+                # Only wait for company when others are already queued behind
+                # it; a lone request is dispatched immediately.
+                if not self._queue.empty():
+                    deadline = loop.time() + self._max_wait
+                    while len(batch) < self._max_batch:
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                        except asyncio.TimeoutError:
+                            break
+            except asyncio.CancelledError:
+                self._slots.release()
+                for _, fut in batch:
+                    fut.cancel()
+                raise
+            task = asyncio.create_task(self._process(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _process(self, batch: List[Tuple[pd.DataFrame, asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.to_thread(self._summarize, [df for df, _ in batch])
+        except Exception as err:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(err)
+            return
+        finally:
+            self._slots.release()
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def _summarize(self, frames: List[pd.DataFrame]) -> List[dict]:
+        return summarize_batch(frames, self._get_model())
+
+
+def summarize_batch(
+    frames: List[pd.DataFrame],
+    model,
+    merchant_col: str = "merchant",
+    amount_col: str = "amount",
+) -> List[dict]:
+    """Summarize several transaction frames with a single model prediction."""
+    combined = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    merchant_col: df[merchant_col].to_numpy(dtype=object),
+                    amount_col: df[amount_col].to_numpy(),
+                    _REQ_ID_COL: i,
+                }
+            )
+            for i, df in enumerate(frames)
+        ],
+        ignore_index=True,
+    )
+    categorized = categorize_transactions(combined, model, merchant_col, amount_col)
+    parts = dict(tuple(categorized.groupby(combined[_REQ_ID_COL], sort=False)))
+    return [
+        aggregate_by_category(parts.get(i, categorized.iloc[0:0]), amount_col)
+        for i in range(len(frames))
+    ]
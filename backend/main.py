@@ -1,69 +1,152 @@
-from typing import List, Optional
+import asyncio
+import io
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from cachetools import TTLCache
+from fastapi import Cookie, FastAPI, HTTPException, Request, Response, UploadFile, File
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, conlist
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
 
 try:
+    from backend import model_registry
+    from backend.batching import SummaryBatcher
     from backend.ml_pipeline import (
-        load_category_model,
         summarize_transactions,
+        summarize_all_users,
         summarize_user_spending,
-        load_transaction_data,
+        read_transactions_csv,
+    )
+    from backend.pdf_to_csv import convert_pdf_to_dataframe
+    from backend.schemas import (
+        Transaction,
+        TransactionSummaryRequest,
+        TransactionSummaryResponse,
     )
 except ModuleNotFoundError:
+    import model_registry
+    from batching import SummaryBatcher
     from ml_pipeline import (
-        load_category_model,
         summarize_transactions,
+        summarize_all_users,
         summarize_user_spending,
-        load_transaction_data,
+        read_transactions_csv,
+    )
+    from pdf_to_csv import convert_pdf_to_dataframe
+    from schemas import (
+        Transaction,
+        TransactionSummaryRequest,
+        TransactionSummaryResponse,
     )
 
-# In-memory storage for uploaded transaction data (more secure than file storage)
-_uploaded_data: Optional[pd.DataFrame] = None
 
+# In-memory storage for uploaded transaction data (more secure than file storage),
+# keyed by the session cookie so concurrent users never see each other's uploads.
+# Each entry maps str(user_id) to that user's spending payload, computed once at
+# upload time; the parsed frame itself is not kept. Entries are replaced, never
+# mutated.
+SESSION_COOKIE = "capitalyou_session"
+_SESSION_TTL_SECONDS = 60 * 60
+_uploads: TTLCache = TTLCache(maxsize=256, ttl=_SESSION_TTL_SECONDS)
 
-class Transaction(BaseModel):
-    merchant: str
-    amount: float
-    user_id: Optional[str] = None
-    date: Optional[str] = None
-    location: Optional[str] = None
+# Per-user spending summaries of the bundled default statement
+_spend_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+# One lock per in-flight cache key so concurrent misses compute only once
+_spend_cache_locks: Dict[int, asyncio.Lock] = {}
 
 
-class CategorySummary(BaseModel):
-    category: str
-    total_spent: float
-    percentage_of_total: float
+# Bulk formats parsed directly by pandas, bypassing per-row model validation
+_BULK_CONTENT_TYPES = {"text/csv", "application/x-ndjson"}
 
 
-class TransactionSummaryResponse(BaseModel):
-    total_spent: float
-    by_category: List[CategorySummary]
+# Coalesces concurrent summary requests; started with the app's event loop
+_summary_batcher: Optional[SummaryBatcher] = None
 
 
-class TransactionSummaryRequest(BaseModel):
-    transactions: conlist(Transaction, min_length=1)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _summary_batcher
+    # Blocking pandas/sklearn work runs via asyncio.to_thread. Most of it holds
+    # the GIL, so threads mainly keep the event loop free rather than add CPU
+    # parallelism; keep asyncio's default pool size so a slow upload or PDF
+    # parse cannot starve every other request.
+    executor = ThreadPoolExecutor(
+        max_workers=min(32, (os.cpu_count() or 1) + 4),
+        thread_name_prefix="capitalyou",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    # Load the model in the background so startup and health checks are not
+    # held up; a request that needs it first just waits for the load.
+    model_load = asyncio.create_task(asyncio.to_thread(model_registry.get_model))
+    _summary_batcher = SummaryBatcher(model_registry.get_model)
+    _summary_batcher.start()
 
+    yield
+
+    await _summary_batcher.stop()
+    _summary_batcher = None
+    await model_load
+    executor.shutdown(wait=True)
+
+
+app = FastAPI(
+    title="CapitalYou Card API",
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializes the summary payloads much faster than the stdlib json module
+    default_response_class=ORJSONResponse,
+)
+
+# Uploaded files may be at most 5MB; the request itself is allowed a little
+# extra for the multipart envelope.
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+_MAX_UPLOAD_REQUEST_BYTES = MAX_UPLOAD_BYTES + 64 * 1024
 
-_category_model = None
-_model_load_error: Optional[str] = None
-try:
-    _category_model = load_category_model()
-except Exception as err:
-    _model_load_error = str(err)
 
+class RejectOversizedUploads:
+    """Refuse oversized uploads from Content-Length before the body is read.
 
-app = FastAPI(title="CapitalYou Card API", version="1.0.0")
+    Plain ASGI so every other request passes straight through untouched.
+    """
 
-# CORS configuration to allow frontend requests
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/api/transactions/upload":
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > _MAX_UPLOAD_REQUEST_BYTES:
+                response = ORJSONResponse(
+                    status_code=413,
+                    content={"detail": "File size exceeds 5MB limit"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+# Added before CORS so CORS stays outermost and the 413 carries its headers
+app.add_middleware(RejectOversizedUploads)
+
+
+# CORS configuration to allow frontend requests. Only the methods and headers
+# the frontend actually sends are allowed, and browsers may cache preflight
+# answers for an hour so most requests skip the extra OPTIONS round trip.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:3000"],  # Vite and React ports
+    allow_origins=frozenset({"http://localhost:5173", "http://localhost:3000"}),  # Vite and React ports
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=("GET", "POST"),
+    allow_headers=("Content-Type",),
+    max_age=60 * 60,
 )
 
 
@@ -82,41 +165,189 @@ async def test_endpoint():
     return {"success": True, "data": "This is a test response from FastAPI"}
 
 
-@app.post("/api/transactions/summary", response_model=TransactionSummaryResponse)
-async def transactions_summary(payload: TransactionSummaryRequest):
-    if _category_model is None:
+async def _get_model():
+    """Return the category model (None if loading failed).
+
+    Once the model is loaded this returns without a thread hop; only while
+    the load is still pending does it wait for it in a worker thread.
+    """
+    model = model_registry.peek()
+    if model is None and model_registry.load_error() is None:
+        model = await asyncio.to_thread(model_registry.get_model)
+    return model
+
+
+async def _require_model():
+    """Return the category model, or raise 503 if it is unavailable."""
+    model = await _get_model()
+    if model is None:
         raise HTTPException(
             status_code=503,
-            detail=f"Category model unavailable: {_model_load_error or 'unknown error'}",
+            detail=f"Category model unavailable: {model_registry.load_error() or 'unknown error'}",
         )
+    return model
+
+
+def _transactions_to_frame(transactions: List[Transaction]) -> pd.DataFrame:
+    """Build a DataFrame from validated transactions, one column at a time."""
+    # Pandas gets pre-typed arrays instead of transposing one dict per
+    # transaction. Fields are read straight off the validated models; no
+    # per-row serialization is needed.
+    n = len(transactions)
+    merchants = np.empty(n, dtype=object)
+    amounts = np.empty(n, dtype=np.float64)
+    user_ids = np.empty(n, dtype=object)
+    dates = np.empty(n, dtype=object)
+    locations = np.empty(n, dtype=object)
+    for i, tx in enumerate(transactions):
+        merchants[i] = tx.merchant
+        amounts[i] = tx.amount
+        user_ids[i] = tx.user_id
+        dates[i] = tx.date
+        locations[i] = tx.location
+    df = pd.DataFrame(
+        {
+            "merchant": merchants,
+            "amount": amounts,
+            "user_id": user_ids,
+            "date": dates,
+            "location": locations,
+        }
+    )
+    df["merchant"] = df["merchant"].astype("category")
+    return df
 
-    df = pd.DataFrame([tx.dict() for tx in payload.transactions])
 
+def _bulk_body_to_frame(body: bytes, content_type: str) -> pd.DataFrame:
+    """Parse a CSV or NDJSON request body and validate it column-wise."""
     try:
-        summary = summarize_transactions(df, _category_model)
+        if content_type == "text/csv":
+            df = read_transactions_csv(io.BytesIO(body))
+        else:
+            df = pd.read_json(io.BytesIO(body), lines=True)
     except ValueError as err:
-        raise HTTPException(status_code=400, detail=str(err))
-    except Exception as err:
-        raise HTTPException(status_code=500, detail=f"Failed to summarize transactions: {err}")
+        raise HTTPException(status_code=400, detail=f"Failed to parse transactions: {err}")
 
-@app.get("/api/users/{user_id}/spending-categories")
-async def user_spending_categories(user_id: int):
-    if _category_model is None:
+    missing_columns = [col for col in ("merchant", "amount") if col not in df.columns]
+    if missing_columns:
         raise HTTPException(
-            status_code=503,
-            detail=f"Category model unavailable: {_model_load_error or 'unknown error'}",
+            status_code=400,
+            detail=f"Transactions missing required columns: {', '.join(missing_columns)}",
+        )
+    if df.empty:
+        raise HTTPException(status_code=400, detail="At least one transaction is required")
+
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce")
+    if df["amount"].isna().any():
+        raise HTTPException(status_code=400, detail="Every transaction needs a numeric amount")
+    if df["merchant"].isna().any():
+        raise HTTPException(status_code=400, detail="Every transaction needs a merchant")
+    df["merchant"] = df["merchant"].astype(str).astype("category")
+    return df
+
+
+def _inline_schema(model) -> dict:
+    """Return ``model``'s JSON schema with its ``$defs`` references inlined."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return resolve(defs[ref.rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+
+# The handler reads the raw body itself (to accept bulk formats), so the
+# request body is documented explicitly.
+_SUMMARY_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "application/json": {"schema": _inline_schema(TransactionSummaryRequest)},
+        "text/csv": {"schema": {"type": "string"}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    },
+}
+
+
+def _parse_summary_json(body: bytes) -> TransactionSummaryRequest:
+    """Validate a JSON summary body, reporting errors like a FastAPI body param."""
+    if not body:
+        raise RequestValidationError(
+            [{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}]
         )
     try:
-        # Use uploaded data if available, otherwise fall back to example.csv
-        if _uploaded_data is not None:
-            # Temporarily save to a file for summarize_user_spending to read
-            from pathlib import Path
-            temp_csv = Path(__file__).parent / "temp_uploaded.csv"
-            _uploaded_data.to_csv(temp_csv, index=False)
-            payload = summarize_user_spending(user_id, _category_model, csv_path=temp_csv)
-            temp_csv.unlink()  # Delete temp file
+        return TransactionSummaryRequest.model_validate_json(body)
+    except ValidationError as err:
+        errors = err.errors()
+    if errors[0]["type"] == "json_invalid":
+        try:
+            json.loads(body)
+        except json.JSONDecodeError as exc:
+            raise RequestValidationError(
+                [
+                    {
+                        "type": "json_invalid",
+                        "loc": ("body", exc.pos),
+                        "msg": "JSON decode error",
+                        "input": {},
+                        "ctx": {"error": exc.msg},
+                    }
+                ],
+                body=exc.doc,
+            )
+        except UnicodeDecodeError:
+            # Same answer FastAPI gives for an undecodable body parameter
+            raise HTTPException(status_code=400, detail="There was an error parsing the body")
+    raise RequestValidationError(
+        [{**error, "loc": ("body", *error["loc"])} for error in errors], body=body
+    )
+
+
+@app.post(
+    "/api/transactions/summary",
+    response_model=TransactionSummaryResponse,
+    openapi_extra={"requestBody": _SUMMARY_REQUEST_BODY},
+)
+async def transactions_summary(request: Request):
+    """Summarize transactions sent as JSON, CSV (``text/csv``) or NDJSON.
+
+    JSON bodies are validated against ``TransactionSummaryRequest``. CSV and
+    NDJSON bodies skip per-transaction validation and are parsed straight
+    into a DataFrame, then checked column-wise.
+    """
+    model = await _require_model()
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    if content_type in _BULK_CONTENT_TYPES:
+        df = await asyncio.to_thread(_bulk_body_to_frame, body, content_type)
+    else:
+        payload = _parse_summary_json(body)
+        df = await asyncio.to_thread(_transactions_to_frame, payload.transactions)
+
+    try:
+        if _summary_batcher is not None:
+            summary = await _summary_batcher.submit(df)
         else:
-            payload = summarize_user_spending(user_id, _category_model)
+            summary = await asyncio.to_thread(summarize_transactions, df, model)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=500, detail=f"Failed to summarize transactions: {err}")
+
+    return summary
+
+
+def _compute_user_spending(user_id: int, model) -> dict:
+    try:
+        payload = summarize_user_spending(user_id, model)
     except ValueError as err:
         raise HTTPException(status_code=404, detail=str(err))
     except Exception as err:
@@ -127,8 +358,69 @@ async def user_spending_categories(user_id: int):
     return payload
 
 
+@app.get("/api/users/{user_id}/spending-categories")
+async def user_spending_categories(
+    user_id: int,
+    session_id: Optional[str] = Cookie(None, alias=SESSION_COOKIE),
+):
+    model = await _require_model()
+    # Uploaded data was summarized per user when it arrived. A session that
+    # is unknown (expired or evicted) is an error rather than a silent switch
+    # to the demo statement.
+    if session_id:
+        by_user = _uploads.get(session_id)
+        if by_user is None:
+            raise HTTPException(
+                status_code=410,
+                detail="Upload session expired or not found. Please upload your file again.",
+            )
+        payload = by_user.get(str(user_id))
+        if payload is None:
+            raise HTTPException(
+                status_code=404, detail=f"No transactions found for user {user_id!r}."
+            )
+        return payload
+
+    # Without a session cookie, serve the bundled demo statement
+    key = user_id
+    payload = _spend_cache.get(key)
+    if payload is not None:
+        return payload
+
+    lock = _spend_cache_locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            payload = _spend_cache.get(key)
+            if payload is None:
+                payload = await asyncio.to_thread(_compute_user_spending, user_id, model)
+                _spend_cache[key] = payload
+    finally:
+        _spend_cache_locks.pop(key, None)
+
+    return payload
+
+
+def _compact_uploaded_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Narrow the columns the upload-time summaries read.
+
+    Merchants and user ids are dictionary-encoded as categoricals so each
+    distinct value is normalized and grouped once, and amounts become a
+    float64 array. Amounts stay float64: float32 cannot hold larger
+    statement totals to the cent. Other columns are left as parsed.
+    """
+    for col in ("merchant", "user_id"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    df["amount"] = pd.to_numeric(df["amount"], errors="coerce").astype(np.float64)
+    return df
+
+
 @app.post("/api/transactions/upload")
-async def upload_transactions(file: UploadFile = File(...)):
+async def upload_transactions(
+    response: Response,
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Cookie(None, alias=SESSION_COOKIE),
+):
     """Upload a CSV or PDF file with transaction data"""
     print(f"Received file upload: {file.filename}")
     
@@ -141,29 +433,29 @@ async def upload_transactions(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be a CSV or PDF")
     
     try:
-        # Read file content
-        contents = await file.read()
-        print(f"File size: {len(contents)} bytes")
+        # Starlette has already spooled the upload; parse from that file
+        # rather than copying the whole body into a bytes object first.
+        upload = file.file
+        upload.seek(0, os.SEEK_END)
+        size = upload.tell()
+        upload.seek(0)
+        print(f"File size: {size} bytes")
+        if size == 0:
+            print("Error: Empty file")
+            raise HTTPException(status_code=400, detail="File is empty")
         
-        # Validate file size (5MB max)
-        max_size = 5 * 1024 * 1024  # 5MB in bytes
-        if len(contents) > max_size:
+        # Validate file size (5MB max); covers chunked bodies without Content-Length
+        if size > MAX_UPLOAD_BYTES:
             raise HTTPException(
                 status_code=400, 
-                detail=f"File size exceeds 5MB limit. Your file is {len(contents) / (1024 * 1024):.2f}MB"
+                detail=f"File size exceeds 5MB limit. Your file is {size / (1024 * 1024):.2f}MB"
             )
         
-        # Parse the file using load_transaction_data which handles both CSV and PDF
-        from pathlib import Path
-        import tempfile
-
-        # Save temporarily and use load_transaction_data to handle it
-        with tempfile.NamedTemporaryFile(suffix=Path(file.filename).suffix, delete=False) as tmp:
-            tmp.write(contents)
-            tmp_path = tmp.name
-        
-        df = load_transaction_data(tmp_path)
-        Path(tmp_path).unlink()
+        # Parsing is blocking pandas/PDF work; keep it off the event loop
+        if is_csv:
+            df = await asyncio.to_thread(read_transactions_csv, upload)
+        else:
+            df = await asyncio.to_thread(convert_pdf_to_dataframe, upload)
         
         print(f"Successfully parsed file with {len(df)} rows")
         print(f"Columns: {df.columns.tolist()}")
@@ -198,8 +490,24 @@ async def upload_transactions(file: UploadFile = File(...)):
                 df['user_id'] = first_user_id
         
         # Store data in memory
-        global _uploaded_data
-        _uploaded_data = df
+        df = await asyncio.to_thread(_compact_uploaded_frame, df)
+        by_user = {}
+        model = await _get_model()
+        if model is not None:
+            by_user = await asyncio.to_thread(summarize_all_users, df, model, first_user_id)
+        # Always mint a new session id: reusing a client-supplied cookie would
+        # let anyone who planted it read this upload (session fixation).
+        if session_id:
+            _uploads.pop(session_id, None)
+        session_id = uuid.uuid4().hex
+        _uploads[session_id] = by_user
+        response.set_cookie(
+            SESSION_COOKIE,
+            session_id,
+            max_age=_SESSION_TTL_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
         print(f"Stored {len(df)} transactions in memory")
         
         print("File upload successful")
@@ -5,7 +5,6 @@ pipeline, prints evaluation metrics, and saves the model to `backend/models/merc
 """
 from pathlib import Path
 import sys
-import re
 import numpy as np
 
 import pandas as pd
@@ -19,6 +18,10 @@ from sklearn.pipeline import Pipeline, FeatureUnion
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, brier_score_loss
 from sklearn.preprocessing import LabelBinarizer
 
+# Share merchant normalization with the serving code in backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from text_norm import normalize_text  # noqa: E402
+
 
 def main():
     """Train the merchant->category classifier pipeline and save the model.
@@ -36,38 +39,10 @@ def main():
     
     # Preprocess merchant strings for training: normalize casing, punctuation and
     # common aliases (e.g., 'H-E-B' -> 'heb', 'door dash' -> 'doordash'). This helps
-    # the TF-IDF features generalize across common variants.
+    # the TF-IDF features generalize across common variants. The same
+    # `normalize_text` runs at inference time, keeping features consistent.
     def preprocess_merchant_series(s: pd.Series) -> pd.Series:
-        aliases = {
-            "door dash": "doordash",
-            "door-dash": "doordash",
-            "dd": "doordash",
-            "uber eats": "ubereats",
-            "netflix inc": "netflix",
-        }
-
-        # Normalize individual merchant string: remove separators, punctuation and
-        # collapse spaced single-letter tokens into a single token (e.g., 'h e b' -> 'heb').
-        def normalize(text):
-            t = str(text).lower().strip()
-            # replace common aliases first
-            for k, v in aliases.items():
-                t = t.replace(k, v)
-
-            # remove typical separators inserted between letters (e.g., H-E-B -> HEB)
-            t = re.sub(r'(?<=\w)[-_](?=\w)', '', t)
-
-            # remove punctuation (keep alnum + space)
-            t = re.sub(r"[^a-z0-9\s]", " ", t)
-
-            # collapse patterns like 'h e b' -> 'heb'
-            t = re.sub(r"\b(?:[a-z]\s+){1,}[a-z]\b", lambda m: m.group(0).replace(' ', ''), t)
-
-            # whitespace cleanup
-            t = re.sub(r"\s+", " ", t).strip()
-            return t
-
-        return s.fillna("").astype(str).map(normalize)
+        return s.fillna("").astype(str).map(normalize_text)
 
     df["merchant"] = preprocess_merchant_series(df["merchant"])
 
@@ -1,134 +1,278 @@
 """Helpers for merchant-category classification and summary generation."""
 from __future__ import annotations
 
-import re
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Union, List
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
 import joblib
+import numpy as np
 import pandas as pd
 
-DEFAULT_MODEL_PATH = Path(__file__).parent / "ml model" / "models" / "merchant_category_model.pkl"
-DEFAULT_TRANSACTIONS_CSV = Path(__file__).parent / "capital_one_professional_statement.pdf"
+try:
+    from backend.pdf_to_csv import convert_pdf_to_dataframe
+    from backend.text_norm import normalize_text
+except ModuleNotFoundError:
+    from pdf_to_csv import convert_pdf_to_dataframe
+    from text_norm import normalize_text
+
+try:
+    import pyarrow  # noqa: F401
 
-_ALIAS_MAP = {
-    "door dash": "doordash",
-    "door-dash": "doordash",
-    "dd": "doordash",
-    "uber eats": "ubereats",
-    "netflix inc": "netflix",
-}
+    # pyarrow's CSV reader tokenizes in parallel; fall back to pandas' C parser.
+    CSV_ENGINE = "pyarrow"
+except ImportError:  # pragma: no cover - environment dependent
+    CSV_ENGINE = "c"
 
+DEFAULT_MODEL_PATH = Path(__file__).parent / "ml model" / "models" / "merchant_category_model.pkl"
+DEFAULT_TRANSACTIONS_CSV = Path(__file__).parent / "capital_one_professional_statement.pdf"
 
-def _normalize_text(text: object) -> str:
-    """Normalize a single merchant string to match training-time logic."""
-    t = str(text).lower().strip()
-    for alias, replacement in _ALIAS_MAP.items():
-        t = t.replace(alias, replacement)
-    t = re.sub(r"(?<=\w)[-_](?=\w)", "", t)
-    t = re.sub(r"[^a-z0-9\s]", " ", t)
-    t = re.sub(r"\b(?:[a-z]\s+){1,}[a-z]\b", lambda match: match.group(0).replace(" ", ""), t)
-    t = re.sub(r"\s+", " ", t).strip()
-    return t
+# Bounded LRU of normalized merchant -> predicted category, one per loaded model
+PREDICTION_CACHE_SIZE = 50_000
+_prediction_caches: "weakref.WeakKeyDictionary[object, OrderedDict[str, str]]" = (
+    weakref.WeakKeyDictionary()
+)
+_prediction_cache_lock = threading.Lock()
 
 
 def normalize_merchant_series(series: pd.Series) -> pd.Series:
-    """Apply consistent normalization to a series of merchant names."""
-    return series.fillna("").astype(str).map(_normalize_text)
+    """Apply consistent normalization to a series of merchant names.
 
+    The result is a categorical Series of normalized names.
+    """
+    # Merchant names repeat heavily, so normalize each distinct value once and
+    # broadcast through integer codes; missing values (code -1) pick up the
+    # trailing empty string.
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories.astype(str)
+    else:
+        codes, uniques = pd.factorize(series.fillna("").astype(str))
+    lookup = np.array([normalize_text(value) for value in uniques] + [""], dtype=object)
+    # Different raw spellings can normalize to the same name; re-factorize so
+    # the result is categorical with each normalized merchant stored once.
+    lookup_codes, normalized = pd.factorize(lookup)
+    return pd.Series(
+        pd.Categorical.from_codes(lookup_codes[codes], categories=normalized),
+        index=series.index,
+        name=series.name,
+    )
 
-def load_category_model(model_path: Union[str, Path] = DEFAULT_MODEL_PATH):
-    """Load the saved merchant-category classifier."""
-    path = Path(model_path)
+
+def _resolve_path(path: Union[str, Path]) -> Path:
+    """Resolve ``path`` relative to this module's directory unless absolute."""
+    path = Path(path)
     if not path.is_absolute():
         path = (Path(__file__).parent / path).resolve()
+    return path
+
+
+def load_category_model(model_path: Union[str, Path] = DEFAULT_MODEL_PATH):
+    """Load the saved merchant-category classifier.
+
+    Loaded models are cached, so repeated calls for an unchanged file return
+    the same object.
+    """
+    path = _resolve_path(model_path)
     if not path.exists():
         raise FileNotFoundError(f"Model file not found at {path!r}")
+    return _load_model_file(str(path), path.stat().st_mtime_ns)
+
+
+@lru_cache(maxsize=2)
+def _load_model_file(path: str, mtime_ns: int):
+    """Unpickle the model once per (path, mtime); repeat loads reuse the object."""
     return joblib.load(path)
 
 
+def _prediction_cache(model) -> Optional["OrderedDict[str, str]"]:
+    """Return the merchant -> category LRU for ``model`` (None if it can't be cached)."""
+    try:
+        return _prediction_caches.setdefault(model, OrderedDict())
+    except TypeError:
+        return None
+
+
 def _safe_predict(model, merchants: Iterable[str]) -> List[str]:
     merchant_list = list(merchants)
-    try:
-        return list(model.predict(merchant_list))
-    except Exception:
-        return ["unknown"] * len(merchant_list)
+    # Statements repeat merchants heavily, so classify each distinct name once
+    # and broadcast the predictions back through the factorized codes.
+    codes, uniques = pd.factorize(np.asarray(merchant_list, dtype=object))
+    predictions = np.empty(len(uniques), dtype=object)
+
+    # Names seen in earlier calls are served from the per-model LRU; only the
+    # misses go to the model.
+    missing = []
+    with _prediction_cache_lock:
+        cache = _prediction_cache(model)
+        for i, merchant in enumerate(uniques):
+            label = cache.get(merchant) if cache is not None else None
+            if label is None:
+                missing.append(i)
+            else:
+                cache.move_to_end(merchant)
+                predictions[i] = label
 
+    if missing:
+        try:
+            predicted = model.predict([uniques[i] for i in missing])
+        except Exception:
+            return ["unknown"] * len(merchant_list)
+        with _prediction_cache_lock:
+            for i, label in zip(missing, predicted):
+                predictions[i] = label
+                if cache is not None:
+                    cache[uniques[i]] = label
+            while cache is not None and len(cache) > PREDICTION_CACHE_SIZE:
+                cache.popitem(last=False)
+
+    return list(predictions[codes])
+
+
+def _require_columns(df: pd.DataFrame, *columns: str) -> None:
+    missing = set(columns) - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
 
-def summarize_transactions(
+
+def categorize_transactions(
     df: pd.DataFrame,
     model,
     merchant_col: str = "merchant",
     amount_col: str = "amount",
-) -> dict:
-    """Normalize, predict, and aggregate transactions by predicted category."""
-    required_columns = {merchant_col, amount_col}
-    missing = required_columns - set(df.columns)
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
+) -> pd.DataFrame:
+    """Return normalized merchants, numeric amounts and predictions for ``df``.
+
+    The result is a new frame indexed like ``df`` with only the merchant,
+    amount and ``predicted_category`` columns; ``df`` itself is not copied or
+    modified. Group it by other columns of ``df`` (they align on the index).
+    """
+    _require_columns(df, merchant_col, amount_col)
+
+    merchants = normalize_merchant_series(df[merchant_col])
+    amounts = df[amount_col]
+    # Numeric columns (the usual case) just need a float cast; only text
+    # amounts go through the element-wise to_numeric parse.
+    if amounts.dtype.kind in "iuf":
+        amounts = amounts.astype(np.float64).fillna(0.0)
+    else:
+        amounts = pd.to_numeric(amounts, errors="coerce").fillna(0.0)
+    # Predict once per distinct merchant (the categories) and broadcast the
+    # labels back through the integer codes.
+    labels = _safe_predict(model, merchants.cat.categories)
+    label_codes, label_uniques = pd.factorize(np.asarray(labels, dtype=object))
+    predicted = pd.Categorical.from_codes(
+        label_codes[merchants.cat.codes.to_numpy()], categories=label_uniques
+    )
+    return pd.DataFrame(
+        {merchant_col: merchants, amount_col: amounts, "predicted_category": predicted},
+        index=df.index,
+    )
 
-    df = df.copy()
-    df[merchant_col] = normalize_merchant_series(df[merchant_col])
-    df[amount_col] = pd.to_numeric(df[amount_col], errors="coerce").fillna(0.0)
-    merchants = df[merchant_col]
-    df["predicted_category"] = _safe_predict(model, merchants)
 
-    summary = (
-        df.groupby("predicted_category")[amount_col]
+def aggregate_by_category(df: pd.DataFrame, amount_col: str = "amount") -> dict:
+    """Aggregate categorized transactions into per-category totals and shares."""
+    # One unsorted groupby on the Series, then a single sort by total; no
+    # intermediate frames.
+    totals = (
+        df.groupby("predicted_category", sort=False, observed=True)[amount_col]
         .sum()
-        .reset_index()
-        .rename(columns={amount_col: "total_spent"})
+        .sort_values(ascending=False, kind="stable")
     )
 
-    total_spent = float(summary["total_spent"].sum())
+    amounts = totals.to_numpy(dtype=np.float64)
+    total_spent = float(amounts.sum())
     if total_spent == 0:
-        summary["percentage_of_total"] = 0.0
+        percentages = np.zeros(len(amounts))
     else:
-        summary["percentage_of_total"] = summary["total_spent"] / total_spent * 100
-
-    summary = summary.sort_values("total_spent", ascending=False)
+        percentages = amounts / total_spent * 100.0
 
     return {
-        "total_spent": float(total_spent),
+        "total_spent": total_spent,
         "by_category": [
             {
-                "category": str(row["predicted_category"]),
-                "total_spent": float(row["total_spent"]),
-                "percentage_of_total": float(row["percentage_of_total"]),
+                "category": str(category),
+                "total_spent": float(amount),
+                "percentage_of_total": float(percentage),
             }
-            for _, row in summary.iterrows()
+            for category, amount, percentage in zip(
+                totals.index.tolist(), amounts.tolist(), percentages.tolist()
+            )
         ],
     }
 
 
+def summarize_transactions(
+    df: pd.DataFrame,
+    model,
+    merchant_col: str = "merchant",
+    amount_col: str = "amount",
+) -> dict:
+    """Normalize, predict, and aggregate transactions by predicted category."""
+    if df.empty:
+        _require_columns(df, merchant_col, amount_col)
+        return {"total_spent": 0.0, "by_category": []}
+    categorized = categorize_transactions(df, model, merchant_col, amount_col)
+    return aggregate_by_category(categorized, amount_col)
+
+
+def read_transactions_csv(source, **kwargs) -> pd.DataFrame:
+    """Read transactions CSV data from a path or file-like with the fastest available engine."""
+    try:
+        return pd.read_csv(source, engine=CSV_ENGINE, **kwargs)
+    except pd.errors.ParserError as err:
+        if CSV_ENGINE != "pyarrow":
+            raise
+        # pyarrow reports input without any columns as a parse error; raise
+        # EmptyDataError like the C engine so callers handle both the same way.
+        if "Empty CSV file" in str(err):
+            raise pd.errors.EmptyDataError("No columns to parse from file") from err
+        # pyarrow is stricter than the C engine (e.g. rows with fewer fields
+        # than the header, which the C engine pads with NaN); retry with it.
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_csv(source, engine="c", **kwargs)
+
+
 def load_transaction_data(
     csv_path: Union[str, Path] = DEFAULT_TRANSACTIONS_CSV,
+    columns: Optional[Sequence[str]] = None,
 ) -> pd.DataFrame:
     """Load the transaction dataset.
 
-    If a PDF path is provided (``.pdf`` suffix), call the `convert_pdf_to_csv`
-    helper, then read the produced CSV. Otherwise, read the CSV directly.
+    If a PDF path is provided (``.pdf`` suffix), parse it with the
+    `convert_pdf_to_dataframe` helper. Otherwise, read the CSV directly.
+    When ``columns`` is given, only those of them present in the file are
+    loaded; CSV columns outside the list are never parsed.
     """
-    path = Path(csv_path)
-    if not path.is_absolute():
-        path = (Path(__file__).parent / path).resolve()
+    path = _resolve_path(csv_path)
     if not path.exists():
         raise FileNotFoundError(f"Transactions CSV not found at {path!r}")
 
-    # Simple PDF handling: import the helper locally and convert to CSV.
+    # PDFs parse straight into a DataFrame (no intermediate CSV on disk).
+    # Parsing is slow, so reuse the result until the file changes.
     if path.suffix.lower() == ".pdf":
-        try:
-            from pdf_to_csv import convert_pdf_to_csv
-        except Exception as exc:
-            raise ImportError(
-                "PDF support requires the `pypdf` package and the `pdf_to_csv` helper. "
-                "Install with `pip install pypdf` or provide CSV input instead."
-            ) from exc
+        stat = path.stat()
+        df = _load_pdf_statement(str(path), stat.st_mtime_ns, stat.st_size)
+        if columns is not None:
+            return df[[col for col in columns if col in df.columns]].copy()
+        return df.copy()
 
-        csv_path = convert_pdf_to_csv(str(path))
-        return pd.read_csv(csv_path)
+    if columns is None:
+        return read_transactions_csv(path)
+    # The pyarrow engine only takes a list for usecols, so read the header
+    # first and keep the requested columns that exist.
+    header = pd.read_csv(path, nrows=0).columns
+    return read_transactions_csv(path, usecols=[col for col in columns if col in header])
 
-    return pd.read_csv(path)
+
+@lru_cache(maxsize=32)
+def _load_pdf_statement(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """Parse a PDF statement; cached per (path, mtime, size) so edits re-parse."""
+    return convert_pdf_to_dataframe(path)
 
 
 def _calculate_multiplier(percentage: float, max_percentage: float) -> float:
@@ -146,20 +290,64 @@ def summarize_user_spending(
     csv_path: Union[str, Path] = DEFAULT_TRANSACTIONS_CSV,
 ) -> dict:
     """Return a summarized view for the requested user_id."""
-    df = load_transaction_data(csv_path)
-
     normalized_user_id = str(user_id)
+    path = _resolve_path(csv_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Transactions CSV not found at {path!r}")
+    stat = path.stat()
+    df = _load_indexed_transactions(str(path), stat.st_mtime_ns, stat.st_size)
 
     # If the CSV contains no user identifiers, fall back to a global summary
     # and return it for the requested user id (best-effort demo behavior).
     if "user_id" not in df.columns or df["user_id"].dropna().empty:
         summary = summarize_transactions(df, model)
     else:
-        user_df = df[df["user_id"].astype(str) == normalized_user_id]
-        if user_df.empty:
-            raise ValueError(f"No transactions found for user {user_id!r}.")
+        try:
+            user_df = df.loc[[normalized_user_id]]
+        except KeyError:
+            raise ValueError(f"No transactions found for user {user_id!r}.") from None
         summary = summarize_transactions(user_df, model)
 
+    return _user_spending_payload(normalized_user_id, summary)
+
+
+@lru_cache(maxsize=4)
+def _load_indexed_transactions(path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """Load a statement indexed by sorted ``str(user_id)`` for per-user lookups.
+
+    Cached per (path, mtime, size); callers must treat the frame as read-only.
+    """
+    df = load_transaction_data(path, columns=("user_id", "merchant", "amount"))
+    if "user_id" in df.columns:
+        df = df.set_index(df["user_id"].astype(str).rename(None)).sort_index()
+    return df
+
+
+def summarize_all_users(
+    df: pd.DataFrame, model, default_user_id: Optional[str] = None
+) -> Dict[str, dict]:
+    """Return the ``summarize_user_spending`` payload for every user in ``df``.
+
+    The classifier runs once over the whole frame; results are keyed by
+    ``str(user_id)``. ``df`` must have a ``user_id`` column. When ``df`` has
+    no rows and ``default_user_id`` is given, that user gets an empty
+    (zero-spend) payload.
+    """
+    if df.empty:
+        if default_user_id is None:
+            return {}
+        empty = {"total_spent": 0.0, "by_category": []}
+        return {default_user_id: _user_spending_payload(default_user_id, empty)}
+    categorized = categorize_transactions(df, model)
+    user_keys = df["user_id"].astype(str)
+    return {
+        user_id: _user_spending_payload(user_id, aggregate_by_category(user_df))
+        for user_id, user_df in categorized.groupby(user_keys, sort=False)
+    }
+
+
+def _user_spending_payload(normalized_user_id: str, summary: dict) -> dict:
+    """Attach points multipliers to a category summary for one user."""
     max_percentage = max(
         (entry["percentage_of_total"] for entry in summary["by_category"]), default=0.0
     )
@@ -0,0 +1,54 @@
+"""Process-wide holder for the merchant-category model.
+
+The classifier is loaded lazily, exactly once per process, the first time
+something asks for it; every handler reads it from here.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+try:
+    from backend.ml_pipeline import load_category_model
+except ModuleNotFoundError:
+    from ml_pipeline import load_category_model
+
+_lock = threading.Lock()
+_model = None
+_load_error: Optional[str] = None
+
+
+def _load() -> None:
+    global _model, _load_error
+    try:
+        model = load_category_model()
+        # A throwaway prediction pays the one-time lazy initialization costs
+        # here rather than on the first user's request.
+        model.predict(["starbucks"])
+    except Exception as err:
+        _load_error = str(err)
+    else:
+        _model = model
+
+
+def get_model():
+    """Return the classifier, loading it on first use; None if loading failed.
+
+    This blocks while the model loads, so call it from a worker thread.
+    """
+    if _model is None and _load_error is None:
+        with _lock:
+            # Re-check: another thread may have finished loading meanwhile
+            if _model is None and _load_error is None:
+                _load()
+    return _model
+
+
+def peek():
+    """Return the classifier if it has already loaded, else None; never blocks."""
+    return _model
+
+
+def load_error() -> Optional[str]:
+    """Return why the classifier is unavailable, if loading failed."""
+    return _load_error
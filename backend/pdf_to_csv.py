@@ -9,23 +9,34 @@ Design goals:
 
 If you prefer to keep all PDF parsing outside the pipeline, the `convert_pdf_to_csv`
 function can be called independently and its output passed to the existing
-CSV-based pipeline functions.
+CSV-based pipeline functions. The pipeline itself uses `convert_pdf_to_dataframe`
+so no intermediate CSV is written.
 """
 from __future__ import annotations
 
 import re
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
 
 import pandas as pd
 
 _AMOUNT_RE = re.compile(r"\$?(\d{1,3}(?:,\d{3})*(?:\.\d{2}))")
 _DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})")
+# Finds (group 1) or strips amounts and dates (group 2) in one scan of a line
+_AMOUNT_OR_DATE_RE = re.compile(f"{_AMOUNT_RE.pattern}|{_DATE_RE.pattern}")
 
 
 def parse_transactions_from_text(text: str) -> List[Dict[str, object]]:
     """Parse transactions from extracted PDF text.
 
+    See `parse_transaction_lines` for the supported layouts.
+    """
+    return parse_transaction_lines(text.splitlines())
+
+
+def parse_transaction_lines(text_lines: Iterable[str]) -> List[Dict[str, object]]:
+    """Parse transactions from the lines of extracted PDF text.
+
     The parser handles two common layouts:
     1. Multi-line blocks where a date is on its own line followed by merchant,
        optional location, and an amount on a separate line (typical of many
@@ -36,7 +47,10 @@ def parse_transactions_from_text(text: str) -> List[Dict[str, object]]:
     be empty when not found). Lines without recognizable amounts are ignored.
     """
     rows: List[Dict[str, object]] = []
-    lines = [ln.strip() for ln in text.splitlines()]
+    lines = [ln.strip() for ln in text_lines]
+    # Scan every line once up front; the look-ahead below revisits lines, and
+    # each visit would otherwise re-run the date and amount searches.
+    scans = [_scan_line(line) for line in lines]
     i = 0
     while i < len(lines):
         line = lines[i]
@@ -45,23 +59,22 @@ def parse_transactions_from_text(text: str) -> List[Dict[str, object]]:
             continue
 
         # Prefer multi-line pattern starting with a date line
-        date_m = _DATE_RE.search(line)
+        date, amounts = scans[i]
         # Only treat as a multi-line record if the date line does NOT contain an amount
-        if date_m and not _AMOUNT_RE.search(line):
-            date = date_m.group(0)
+        if date and not amounts:
             # Look ahead for merchant and amount
             merchant = ""
             amount = None
             j = i + 1
             # Find the first non-empty line that is not an amount or date to be merchant
             while j < len(lines):
-                if not lines[j].strip():
+                if not lines[j]:
                     j += 1
                     continue
-                if _DATE_RE.search(lines[j]):
+                if scans[j][0]:
                     j += 1
                     continue
-                if _AMOUNT_RE.search(lines[j]):
+                if scans[j][1]:
                     # amount appears immediately after date (no merchant line)
                     break
                 merchant = lines[j]
@@ -71,66 +84,71 @@ def parse_transactions_from_text(text: str) -> List[Dict[str, object]]:
             # From current j, search forward for a line containing the amount
             k = j
             while k < len(lines):
-                amt_match = _AMOUNT_RE.search(lines[k])
-                if amt_match:
+                if scans[k][1]:
                     try:
-                        amount = float(amt_match.group(1).replace(",", ""))
+                        amount = float(scans[k][1][0].replace(",", ""))
                     except ValueError:
                         amount = None
                     break
                 k += 1
 
             if amount is not None:
-                merchant_clean = merchant
-                if merchant_clean:
-                    merchant_clean = _AMOUNT_RE.sub("", merchant_clean)
-                    merchant_clean = _DATE_RE.sub("", merchant_clean)
-                    merchant_clean = merchant_clean.strip(" -:|,\t\n")
-                if not merchant_clean:
-                    merchant_clean = "unknown"
-                rows.append({"merchant": merchant_clean, "amount": amount, "date": date})
+                rows.append({"merchant": _clean_merchant(merchant), "amount": amount, "date": date})
                 # Advance index past the amount line
                 i = k + 1
                 continue
 
         # Fallback: single-line with amount and merchant on same line
-        m = _AMOUNT_RE.findall(line)
-        if m:
-            amt_str = m[-1]
+        if amounts:
+            amt_str = amounts[-1]
             try:
                 amount = float(amt_str.replace(",", ""))
             except ValueError:
                 i += 1
                 continue
 
-            merchant = _AMOUNT_RE.sub("", line)
-            merchant = _DATE_RE.sub("", merchant)
-            merchant = merchant.strip(" -:|,\t\n")
-            if merchant == "":
-                merchant = "unknown"
-
-            date_m = _DATE_RE.search(line)
-            date = date_m.group(0) if date_m else ""
-
-            rows.append({"merchant": merchant, "amount": amount, "date": date})
+            rows.append({"merchant": _clean_merchant(line), "amount": amount, "date": date or ""})
 
         i += 1
 
     return rows
 
 
-def convert_pdf_to_csv(pdf_path: str, output_csv: Optional[str] = None, user_id: Optional[str] = None) -> str:
-    """Convert a PDF file to CSV and return the CSV path.
+def _clean_merchant(text: str) -> str:
+    """Drop amounts/dates and edge punctuation from a merchant line in one pass."""
+    return _AMOUNT_OR_DATE_RE.sub("", text).strip(" -:|,\t\n") or "unknown"
+
+
+def _scan_line(line: str) -> Tuple[Optional[str], List[str]]:
+    """Return the first date and every amount on ``line`` from one regex pass."""
+    date = None
+    amounts: List[str] = []
+    for match in _AMOUNT_OR_DATE_RE.finditer(line):
+        if match.group(1) is not None:
+            amounts.append(match.group(1))
+        elif date is None:
+            date = match.group(2)
+    return date, amounts
+
+
+def convert_pdf_to_dataframe(
+    pdf: Union[str, Path, BinaryIO], user_id: Optional[str] = None
+) -> pd.DataFrame:
+    """Parse a PDF statement straight into a transactions DataFrame.
+
+    `pdf` is a file path or an open binary file object (e.g. an upload).
+    The frame has the columns `user_id`, `date`, `merchant`, `amount`,
+    `location` (matching the project's example CSV layout). Missing user ids
+    and locations are left empty (NaN), just as reading the CSV back would.
 
     The function performs a lazy import of pypdf and raises an informative
     ImportError if the package is not installed.
-
-    The output CSV will contain the columns: `user_id`, `date`, `merchant`,
-    `amount`, `location` (matching the project's example CSV layout).
     """
-    pdf_path = Path(pdf_path)
-    if not pdf_path.exists():
-        raise FileNotFoundError(f"PDF file not found: {pdf_path!r}")
+    if isinstance(pdf, (str, Path)):
+        pdf = Path(pdf)
+        if not pdf.exists():
+            raise FileNotFoundError(f"PDF file not found: {pdf!r}")
+        pdf = str(pdf)
 
     # lazy import so the module can be imported without pypdf installed
     try:
@@ -141,28 +159,38 @@ def convert_pdf_to_csv(pdf_path: str, output_csv: Optional[str] = None, user_id:
             f" Details: {exc}"
         )
 
-    reader = PdfReader(str(pdf_path))
-    pages = [page.extract_text() or "" for page in reader.pages]
-    text = "\n".join(pages)
+    reader = PdfReader(pdf)
+    # Feed page lines straight to the parser rather than joining every page
+    # into one string first; records may still span a page break.
+    lines = (
+        line
+        for page in reader.pages
+        for line in (page.extract_text() or "").splitlines()
+    )
 
-    rows = parse_transactions_from_text(text)
+    rows = parse_transaction_lines(lines)
     if not rows:
         raise ValueError("No transactions could be parsed from the PDF")
 
-    df = pd.DataFrame(rows)
-    df["location"] = ""
+    df = pd.DataFrame.from_records(rows)
+    df["location"] = None
     if "date" not in df.columns:
         df["date"] = ""
-    if user_id is not None:
-        df["user_id"] = user_id
-    else:
-        df["user_id"] = ""
+    df["user_id"] = user_id
 
     # Ensure column order matches example.csv
-    df = df[["user_id", "date", "merchant", "amount", "location"]]
+    return df[["user_id", "date", "merchant", "amount", "location"]]
+
+
+def convert_pdf_to_csv(pdf_path: str, output_csv: Optional[str] = None, user_id: Optional[str] = None) -> str:
+    """Convert a PDF file to CSV and return the CSV path.
+
+    See `convert_pdf_to_dataframe` for the parsing details and output columns.
+    """
+    df = convert_pdf_to_dataframe(pdf_path, user_id=user_id)
 
     if output_csv is None:
-        output_csv = str(pdf_path.with_suffix(".csv"))
+        output_csv = str(Path(pdf_path).with_suffix(".csv"))
 
     df.to_csv(output_csv, index=False)
     return output_csv
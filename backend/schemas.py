@@ -0,0 +1,27 @@
+"""Request and response models for the CapitalYou Card API."""
+from typing import List, Optional
+
+from pydantic import BaseModel, conlist
+
+
+class Transaction(BaseModel):
+    merchant: str
+    amount: float
+    user_id: Optional[str] = None
+    date: Optional[str] = None
+    location: Optional[str] = None
+
+
+class CategorySummary(BaseModel):
+    category: str
+    total_spent: float
+    percentage_of_total: float
+
+
+class TransactionSummaryResponse(BaseModel):
+    total_spent: float
+    by_category: List[CategorySummary]
+
+
+class TransactionSummaryRequest(BaseModel):
+    transactions: conlist(Transaction, min_length=1)
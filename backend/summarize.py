@@ -4,9 +4,12 @@ import json
 import argparse
 from pathlib import Path
 
-import pandas as pd
-
-from ml_pipeline import DEFAULT_MODEL_PATH, load_category_model, summarize_transactions
+from ml_pipeline import (
+    DEFAULT_MODEL_PATH,
+    load_category_model,
+    read_transactions_csv,
+    summarize_transactions,
+)
 
 BASE_DIR = Path(__file__).parent
 DEFAULT_CSV = str(BASE_DIR / "example.csv")
@@ -15,7 +18,7 @@ DEFAULT_MODEL = str(DEFAULT_MODEL_PATH)
 
 def summarize(csv_path: str, model_path: str, output_format: str = "text") -> int:
     model = load_category_model(model_path)
-    df = pd.read_csv(csv_path)
+    df = read_transactions_csv(csv_path, usecols=["merchant", "amount"])
     summary = summarize_transactions(df, model)
 
     if output_format == "json":
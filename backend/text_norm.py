@@ -0,0 +1,51 @@
+"""Merchant-name normalization shared by training (`ml model/train.py`) and serving.
+
+Both sides must produce identical strings, otherwise the TF-IDF features seen
+at inference drift from the ones the model was trained on.
+"""
+from __future__ import annotations
+
+import re
+
+ALIAS_MAP = {
+    "door dash": "doordash",
+    "door-dash": "doordash",
+    "dd": "doordash",
+    "uber eats": "ubereats",
+    "netflix inc": "netflix",
+}
+
+# One alternation pass instead of a str.replace per alias; longest aliases
+# first so e.g. "door-dash" wins over "dd".
+_ALIAS_RE = re.compile(
+    "|".join(re.escape(alias) for alias in sorted(ALIAS_MAP, key=len, reverse=True))
+)
+_SEPARATOR_RE = re.compile(r"(?<=\w)[-_](?=\w)")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+_SPACED_LETTERS_RE = re.compile(r"\b(?:[a-z]\s+){1,}[a-z]\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _replace_alias(match: re.Match) -> str:
+    return ALIAS_MAP[match.group(0)]
+
+
+def _join_spaced_letters(match: re.Match) -> str:
+    return match.group(0).replace(" ", "")
+
+
+def normalize_text(text: object) -> str:
+    """Normalize a single merchant string.
+
+    Lowercases, rewrites common aliases ('door dash' -> 'doordash'), drops
+    separators between letters ('h-e-b' -> 'heb'), turns punctuation into
+    spaces, collapses spaced single letters ('h e b' -> 'heb') and squeezes
+    whitespace.
+    """
+    t = str(text).lower().strip()
+    t = _ALIAS_RE.sub(_replace_alias, t)
+    t = _SEPARATOR_RE.sub("", t)
+    t = _NON_ALNUM_RE.sub(" ", t)
+    t = _SPACED_LETTERS_RE.sub(_join_spaced_letters, t)
+    t = _WHITESPACE_RE.sub(" ", t).strip()
+    return t
@@ -37,7 +37,10 @@ export const healthCheck = async () => {
  * @throws {Error} If the request fails or user is not found
  */
 export const getSpendingCategories = async (userId) => {
-  const response = await fetch(`${API_BASE_URL}/api/users/${userId}/spending-categories`);
+  // Send the session cookie so the backend can find this browser's upload
+  const response = await fetch(`${API_BASE_URL}/api/users/${userId}/spending-categories`, {
+    credentials: 'include',
+  });
   if (!response.ok) {
     throw new Error('Failed to fetch spending categories');
   }
@@ -75,6 +78,7 @@ export const uploadTransactions = async (file) => {
   const response = await fetch(`${API_BASE_URL}/api/transactions/upload`, {
     method: 'POST',
     body: formData,
+    credentials: 'include',
   });
   
   if (!response.ok) {